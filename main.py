@@ -1,13 +1,38 @@
-from ctypes import Union
 import time
+import random
+import re
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from types import MappingProxyType
+from urllib.parse import urlsplit
 import aiohttp  
 import asyncio    
-from typing import Dict, Any, Callable, Optional  
-from pydantic import BaseModel as PydanticBaseModel  
+import sys
+from typing import Dict, Any, Callable, Optional, Union
+from dataclasses import asdict, dataclass
+import jwt
+import orjson
 from src.config import settings
 from src.logging import logger
 
-class AuthState(PydanticBaseModel):
+try:
+    import uvloop  # Faster libuv-based event loop; not available on Windows
+except ImportError:
+    uvloop = None
+
+_NON_DIGIT_RE = re.compile(r'\D')
+_FORM_HEADERS = MappingProxyType({'Content-Type': 'application/x-www-form-urlencoded', 'Connection': 'keep-alive'})
+MAX_BACKOFF_SECONDS = 30.0
+MAX_RETRY_AFTER_SECONDS = 60.0  # Don't let a server's Retry-After park a request longer than this
+CIRCUIT_FAILURE_THRESHOLD = 5
+CIRCUIT_OPEN_SECONDS = 30.0
+PREWARM_TIMEOUT = aiohttp.ClientTimeout(total=3)
+
+class CircuitOpenError(Exception):
+    """Raised when calls to a host are short-circuited after repeated transient failures."""
+
+@dataclass(slots=True)
+class AuthState:
     tenant_url: str | None = None
     bearer_token: str | None = None
     token_expires_at: float = 0.0
@@ -15,48 +40,179 @@ class AuthState(PydanticBaseModel):
     user_id: int | None = None
 
 class FilevineClient:
-    def __init__(self, max_retries: int = 5, backoff_factor: float = 1.0, timeout_seconds: int = 30):
+    # Per-host circuit breakers, shared by every client in the process
+    _breakers: Dict[str, Dict[str, Any]] = {}
+
+    def __init__(self, max_retries: int = 5, backoff_factor: float = 1.0, timeout_seconds: int = 30,
+                 max_connections: int = 20, max_connections_per_host: int = 10):
             self.identity_url =settings.FILEVINE_IDENTITY_URL
             self.util_url =settings.FILEVINE_UTIL_URL
             self.api_base_url = settings.FILEVINE_API_BASE_URL
             self.client_id = settings.FV_CLIENT_ID
             self.client_secret = settings.FV_CLIENT_SECRET
             self.pat = settings.FV_PAT
-            self.headers = {'Content-Type': 'application/x-www-form-urlencoded'}
+            self.headers = _FORM_HEADERS
             self.scope = 'fv.api.gateway.access tenant filevine.v2.api.* email openid fv.auth.tenant.read'
             
             self.auth_state = AuthState()
             self.max_retries = max_retries
             self.backoff_factor = backoff_factor
             self.timeout_seconds = timeout_seconds
+            self._timeout = aiohttp.ClientTimeout(total=timeout_seconds, connect=5, sock_read=timeout_seconds)
+            # aiohttp is HTTP/1.1-only: each in-flight request to a host holds its own socket,
+            # so the per-host limit is the concurrency ceiling (and TLS handshake budget) per host
+            self.max_connections = max_connections
+            self.max_connections_per_host = max_connections_per_host
+            self._session: aiohttp.ClientSession | None = None
+            self._auth_lock = asyncio.Lock()
+            # Monotonic deadline (ns) until which the current auth state is known-good
+            self._auth_ok_until_ns = 0
+            # Header pieces rebuilt only when the token or IDs change, not per request
+            self._auth_header: str | None = None
+            self._base_headers: Dict[str, str] = {'Accept': 'application/json'}
+
+    async def __aenter__(self) -> "FilevineClient":
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.close()
+
+    async def _get_session(self) -> aiohttp.ClientSession:
+        """Returns the shared session, creating it on first use (or after close) so connections stay pooled."""
+        if self._session is None or self._session.closed:
+            # Hold idle sockets well past aiohttp's default 15s so webhook lulls don't force a fresh TLS handshake
+            connector = aiohttp.TCPConnector(
+                limit=self.max_connections,
+                limit_per_host=self.max_connections_per_host,
+                keepalive_timeout=120,
+                enable_cleanup_closed=True,
+                use_dns_cache=True,
+                ttl_dns_cache=600,
+                happy_eyeballs_delay=0.25
+            )
+            self._session = aiohttp.ClientSession(
+                timeout=self._timeout,
+                connector=connector,
+                json_serialize=lambda obj: orjson.dumps(obj).decode()
+            )
+        return self._session
+
+    async def close(self):
+        """Closes the shared session and releases pooled connections."""
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+        self._session = None
 
     def is_token_expired(self) -> bool:
         return time.time() >= self.auth_state.token_expires_at - 60
 
     @staticmethod
-    async def retry_async(func: Callable, *args, max_retries: int = 5, backoff_factor: float = 1.0, **kwargs) -> Any:
-        """Async retry wrapper with exponential backoff for transient errors."""
+    def _parse_retry_after(value: Optional[str]) -> Optional[float]:
+        """Parses a Retry-After header (delta-seconds or HTTP-date) into seconds from now, capped at MAX_RETRY_AFTER_SECONDS."""
+        if not value:
+            return None
+        value = value.strip()
+        if value.isascii() and value.isdigit():
+            # delta-seconds is a non-negative integer (RFC 9110 §10.2.3)
+            delay = float(int(value))
+        else:
+            try:
+                retry_at = parsedate_to_datetime(value)
+            except (TypeError, ValueError):
+                return None
+            if retry_at.tzinfo is None:
+                retry_at = retry_at.replace(tzinfo=timezone.utc)
+            delay = max(0.0, (retry_at - datetime.now(timezone.utc)).total_seconds())
+        return min(delay, MAX_RETRY_AFTER_SECONDS)
+
+    @staticmethod
+    def _backoff_delay(attempt: int, backoff_factor: float, retry_after: Optional[float] = None) -> float:
+        """Full-jitter exponential backoff, floored by the server's Retry-After when given."""
+        delay = random.uniform(0, min(backoff_factor * (2 ** attempt), MAX_BACKOFF_SECONDS))
+        if retry_after is not None:
+            delay = max(delay, retry_after)
+        return delay
+
+    @classmethod
+    def _get_breaker(cls, key: str) -> Dict[str, Any]:
+        return cls._breakers.setdefault(key, {"state": "closed", "failures": 0, "open_until": 0.0, "trial_in_flight": False})
+
+    @classmethod
+    def _check_breaker(cls, key: str) -> bool:
+        """Raises CircuitOpenError while the breaker for key is open.
+
+        Once it cools down, exactly one caller is let through as a trial (returns True); everyone
+        else keeps getting CircuitOpenError until that trial succeeds or fails.
+        """
+        breaker = cls._get_breaker(key)
+        if breaker["state"] == "open":
+            if time.monotonic() < breaker["open_until"]:
+                raise CircuitOpenError(f"Circuit open for {key}; retry after {breaker['open_until'] - time.monotonic():.1f}s")
+            breaker["state"] = "half_open"
+        if breaker["state"] == "half_open":
+            if breaker["trial_in_flight"]:
+                raise CircuitOpenError(f"Circuit half-open for {key}; trial request in flight")
+            breaker["trial_in_flight"] = True
+            return True
+        return False
+
+    @classmethod
+    def _record_breaker_result(cls, key: str, success: bool):
+        breaker = cls._get_breaker(key)
+        breaker["trial_in_flight"] = False
+        if success:
+            breaker.update(state="closed", failures=0, open_until=0.0)
+            return
+        breaker["failures"] += 1
+        if breaker["state"] == "half_open" or breaker["failures"] >= CIRCUIT_FAILURE_THRESHOLD:
+            logger.warning(f"Opening circuit for {key} after {breaker['failures']} consecutive failures.")
+            breaker.update(state="open", open_until=time.monotonic() + CIRCUIT_OPEN_SECONDS)
+
+    @staticmethod
+    async def retry_async(func: Callable, *args, max_retries: int = 5, backoff_factor: float = 1.0, circuit_key: Optional[str] = None, **kwargs) -> Any:
+        """Async retry wrapper with jittered exponential backoff for transient errors.
+
+        When circuit_key (e.g. the URL host) is given, consecutive transient failures are tracked per key
+        and calls fail fast with CircuitOpenError while that breaker is open.
+        """
         last_exception = None  # ADDED: To store the last error for better reporting
         for attempt in range(max_retries):
+            is_trial = FilevineClient._check_breaker(circuit_key) if circuit_key else False
             try:
-                return await func(*args, **kwargs)
+                result = await func(*args, **kwargs)
+                if circuit_key:
+                    FilevineClient._record_breaker_result(circuit_key, success=True)
+                return result
             # CHANGED: Replaced aiohttp.ClientTimeout with asyncio.TimeoutError
             except (asyncio.TimeoutError, aiohttp.ClientConnectionError, aiohttp.ServerDisconnectedError) as e:
-                logger.warning(f"Transient error: {e}. Retrying in {backoff_factor * (2 ** attempt)}s...")
+                delay = FilevineClient._backoff_delay(attempt, backoff_factor)
+                logger.warning(f"Transient error: {e}. Retrying in {delay:.2f}s...")
                 last_exception = e
             except aiohttp.ClientResponseError as e:
                 if e.status == 429 or e.status >= 500:
-                    logger.warning(f"API error {e.status}: {e.message}. Retrying in {backoff_factor * (2 ** attempt)}s...")
+                    retry_after = None
+                    if e.status in (429, 503) and e.headers:
+                        retry_after = FilevineClient._parse_retry_after(e.headers.get("Retry-After"))
+                    delay = FilevineClient._backoff_delay(attempt, backoff_factor, retry_after)
+                    logger.warning(f"API error {e.status}: {e.message}. Retrying in {delay:.2f}s...")
                     last_exception = e
                 else:
-                    # Don't retry for errors like 401, 403, 404, etc.
+                    # Don't retry for errors like 401, 403, 404, etc. (and don't count them against the breaker)
                     raise
             except Exception as e:
                 logger.error(f"Unexpected error: {e}. Not retrying.")
                 raise
+            finally:
+                if is_trial:
+                    # Free the trial slot even if the trial ended in a permanent error or was cancelled;
+                    # transient failures are recorded below (no await in between), which re-opens the breaker
+                    FilevineClient._get_breaker(circuit_key)["trial_in_flight"] = False
+
+            if circuit_key:
+                FilevineClient._record_breaker_result(circuit_key, success=False)
 
             if attempt < max_retries - 1:
-                await asyncio.sleep(backoff_factor * (2 ** attempt))
+                await asyncio.sleep(delay)
 
         # CHANGED: Raise the last known exception for better debugging
         raise RuntimeError(f"Max retries ({max_retries}) exceeded for {func.__name__}") from last_exception
@@ -73,21 +229,26 @@ class FilevineClient:
                 'scope': self.scope
             }
             
-            timeout = aiohttp.ClientTimeout(total=self.timeout_seconds)
-            async with aiohttp.ClientSession(timeout=timeout) as session:
-                async with session.post(self.identity_url, headers=self.headers, data=payload) as res:
-                    if res.status != 200:
-                        error_text = await res.text()
-                        logger.error(f"Token fetch failed ({res.status}): {error_text}")
-                        raise aiohttp.ClientResponseError(res.request_info, res.history, status=res.status, message=error_text)
-                    data = await res.json()
-                    self.auth_state.bearer_token = data['access_token']
+            session = await self._get_session()
+            async with session.post(self.identity_url, headers=self.headers, data=payload) as res:
+                if res.status != 200:
+                    error_text = await res.text()
+                    logger.error(f"Token fetch failed ({res.status}): {error_text}")
+                    raise aiohttp.ClientResponseError(res.request_info, res.history, status=res.status, message=error_text, headers=res.headers)
+                data = await res.json(loads=orjson.loads)
+                self.auth_state.bearer_token = data['access_token']
+                self._auth_header = f"Bearer {self.auth_state.bearer_token}"
+                # Prefer the token's own 'exp' claim (already epoch seconds); fall back to expires_in
+                try:
+                    claims = jwt.decode(data['access_token'], options={"verify_signature": False})
+                    self.auth_state.token_expires_at = float(claims['exp'])
+                except (jwt.PyJWTError, KeyError, TypeError, ValueError):
                     self.auth_state.token_expires_at = time.time() + data['expires_in']
-                    logger.info("Bearer token fetched.")
-                    return self.auth_state.bearer_token
+                logger.info("Bearer token fetched.")
+                return self.auth_state.bearer_token
         
         try:
-            return await self.retry_async(_fetch, max_retries=self.max_retries, backoff_factor=self.backoff_factor)
+            return await self.retry_async(_fetch, max_retries=self.max_retries, backoff_factor=self.backoff_factor, circuit_key=urlsplit(self.identity_url).netloc)
         except aiohttp.ClientResponseError as e:
             if e.status == 401:
                 logger.warning("401 during token fetch—possible invalid creds. Not retrying.")
@@ -97,35 +258,71 @@ class FilevineClient:
         """Fetches user and org IDs using the current bearer token and updates state."""
         async def _fetch():
             logger.info("Fetching user/org IDs...")
-            auth_headers = {'Authorization': f'Bearer {self.auth_state.bearer_token}'}
+            auth_headers = {'Authorization': self._auth_header}
             
-            timeout = aiohttp.ClientTimeout(total=self.timeout_seconds)
-            async with aiohttp.ClientSession(timeout=timeout) as session:
-                async with session.post(self.util_url, headers=auth_headers) as res:
-                    if res.status != 200:
-                        error_text = await res.text()
-                        logger.error(f"ID fetch failed ({res.status}): {error_text}")
-                        raise aiohttp.ClientResponseError(res.request_info, res.history, status=res.status, message=error_text)
-                    data = await res.json()
-                    logger.debug(f"DATA: {data}")
-                    self.auth_state.tenant_url = data['orgs'][0]['tenant']['hostNameAsUrl']
-                    self.auth_state.user_id = data['user']['userId']['native']
-                    self.auth_state.org_id = data['orgs'][0]['orgId']
-                    logger.info("User/org IDs fetched.")
-                    return {'user_id': self.auth_state.user_id, 'org_id': self.auth_state.org_id}
+            session = await self._get_session()
+            async with session.post(self.util_url, headers=auth_headers) as res:
+                if res.status != 200:
+                    error_text = await res.text()
+                    logger.error(f"ID fetch failed ({res.status}): {error_text}")
+                    raise aiohttp.ClientResponseError(res.request_info, res.history, status=res.status, message=error_text, headers=res.headers)
+                data = await res.json(loads=orjson.loads)
+                logger.debug(f"DATA: {data}")
+                self.auth_state.tenant_url = data['orgs'][0]['tenant']['hostNameAsUrl']
+                self.auth_state.user_id = data['user']['userId']['native']
+                self.auth_state.org_id = data['orgs'][0]['orgId']
+                self._base_headers = {
+                    'x-fv-orgid': str(self.auth_state.org_id),
+                    'x-fv-userid': str(self.auth_state.user_id),
+                    'Accept': 'application/json'
+                }
+                logger.info("User/org IDs fetched.")
+                return {'user_id': self.auth_state.user_id, 'org_id': self.auth_state.org_id}
         
-        return await self.retry_async(_fetch, max_retries=self.max_retries, backoff_factor=self.backoff_factor)
+        return await self.retry_async(_fetch, max_retries=self.max_retries, backoff_factor=self.backoff_factor, circuit_key=urlsplit(self.util_url).netloc)
 
     async def ensure_auth_state(self):
         """Ensures valid auth state: refreshes token if needed, fetches IDs if missing."""
-        if not self.auth_state.bearer_token or self.is_token_expired():
-            logger.info("Token missing or expired—refreshing...")
-            await self.fetch_bearer_token()
-        
-        if not self.auth_state.org_id or not self.auth_state.user_id:
-            logger.info("Org/User IDs missing—fetching...")
-            await self.fetch_user_org_ids()
+        if time.monotonic_ns() < self._auth_ok_until_ns:
+            return
+
+        # Serialize refreshes so concurrent callers don't all hit the identity endpoint;
+        # state is re-checked under the lock, so waiters reuse whatever the first caller fetched.
+        async with self._auth_lock:
+            needs_ids = not self.auth_state.org_id or not self.auth_state.user_id
+            warmup = None
+            if not self.auth_state.bearer_token or self.is_token_expired():
+                if needs_ids:
+                    # The util call has to wait for the token, but its TCP/TLS setup doesn't
+                    warmup = asyncio.create_task(self._prewarm_connection(self.util_url))
+                logger.info("Token missing or expired—refreshing...")
+                try:
+                    await self.fetch_bearer_token()
+                except BaseException:
+                    # Don't hold the auth lock waiting on a request whose only job was warming a socket
+                    if warmup is not None:
+                        warmup.cancel()
+                    raise
+                if warmup is not None:
+                    await warmup
+            
+            if needs_ids:
+                logger.info("Org/User IDs missing—fetching...")
+                await self.fetch_user_org_ids()
+
+            # Same 60s skew as is_token_expired, converted from wall-clock to a monotonic deadline
+            valid_for = self.auth_state.token_expires_at - 60 - time.time()
+            self._auth_ok_until_ns = time.monotonic_ns() + int(valid_for * 1_000_000_000)
         logger.info("Auth state ensured.")
+
+    async def _prewarm_connection(self, url: str):
+        """Opens a pooled keep-alive connection to url's host with a throwaway HEAD; failures are ignored."""
+        try:
+            session = await self._get_session()
+            async with session.head(url, allow_redirects=False, timeout=PREWARM_TIMEOUT):
+                pass
+        except (asyncio.TimeoutError, aiohttp.ClientError) as e:
+            logger.debug(f"Connection pre-warm for {url} failed: {e}")
         
     async def _fetch_auth_state(self) -> Dict[str, Any]:
         """Checks auth state (fetches if needed) and returns the auth variables as dict."""
@@ -138,62 +335,40 @@ class FilevineClient:
             'tenant_url': self._tenant_url
         }
         
+    async def _request(self, method: str, url: str, *, params: Dict[str, Any] = None, json: Dict[str, Any] = None) -> Dict[str, Any]:
+        """Single authenticated request attempt; retries are handled by the caller via retry_async."""
+        logger.info(f"{method} {url}")
+        headers = {**self._base_headers, 'Authorization': self._auth_header}
+        if json is not None:
+            headers['Content-Type'] = 'application/json'
+        
+        session = await self._get_session()
+        async with session.request(method, url, headers=headers, params=params, json=json) as res:
+            if res.status != 200:
+                error_text = await res.text()
+                logger.error(f"{method} failed ({res.status}): {error_text}")
+                raise aiohttp.ClientResponseError(res.request_info, res.history, status=res.status, message=error_text, headers=res.headers)
+            try:
+                return await res.json(loads=orjson.loads)
+            except aiohttp.ContentTypeError as e:
+                logger.error(f"JSON decode error: {e}")
+                raise
+
+    async def _make_request(self, method: str, url: str, *, params: Dict[str, Any] = None, json: Dict[str, Any] = None) -> Dict[str, Any]:
+        """Ensures auth state, then makes the request with retry and error handling."""
+        await self.ensure_auth_state()
+        return await self.retry_async(
+            self._request, method, url, params=params, json=json,
+            max_retries=self.max_retries, backoff_factor=self.backoff_factor, circuit_key=urlsplit(url).netloc
+        )
+
     async def _make_api_call(self, url: str, params: Dict[str, Any] = None) -> Dict[str, Any]:
         """Reusable method for making API calls with auth, retry, and error handling."""
-        await self.ensure_auth_state()
-        
-        async def _fetch():
-            logger.info(f"Requesting URL: {url}")
-            headers = {
-                'Authorization': f'Bearer {self.auth_state.bearer_token}',
-                'x-fv-orgid': str(self.auth_state.org_id),
-                'x-fv-userid': str(self.auth_state.user_id),
-                'Accept': 'application/json'
-            }
-            
-            timeout = aiohttp.ClientTimeout(total=self.timeout_seconds)
-            async with aiohttp.ClientSession(timeout=timeout) as session:
-                async with session.get(url, headers=headers, params=params or {}) as res:
-                    if res.status != 200:
-                        error_text = await res.text()
-                        logger.error(f"Fetch failed ({res.status}): {error_text}")
-                        raise aiohttp.ClientResponseError(res.request_info, res.history, status=res.status, message=error_text)
-                    try:
-                        return await res.json()
-                    except aiohttp.ContentTypeError as e:
-                        logger.error(f"JSON decode error: {e}")
-                        raise
-        
-        return await self.retry_async(_fetch, max_retries=self.max_retries, backoff_factor=self.backoff_factor)
+        return await self._make_request("GET", url, params=params or {})
     
     async def _make_api_patch(self, url: str, payload: Dict[str, Any]) -> Dict[str, Any]:
         """Reusable method for making PATCH API calls with auth, retry, and error handling."""
-        await self.ensure_auth_state()
-        
-        async def _patch():
-            logger.info(f"Patching URL: {url}")
-            headers = {
-                'Authorization': f'Bearer {self.auth_state.bearer_token}',
-                'x-fv-orgid': str(self.auth_state.org_id),
-                'x-fv-userid': str(self.auth_state.user_id),
-                'Accept': 'application/json',
-                'Content-Type': 'application/json'
-            }
-            
-            timeout = aiohttp.ClientTimeout(total=self.timeout_seconds)
-            async with aiohttp.ClientSession(timeout=timeout) as session:
-                async with session.patch(url, headers=headers, json=payload) as res:
-                    if res.status != 200:
-                        error_text = await res.text()
-                        logger.error(f"Patch failed ({res.status}): {error_text}")
-                        raise aiohttp.ClientResponseError(res.request_info, res.history, status=res.status, message=error_text)
-                    try:
-                        return await res.json()
-                    except aiohttp.ContentTypeError as e:
-                        logger.error(f"JSON decode error: {e}")
-                        raise
-        
-        return await self.retry_async(_patch, max_retries=self.max_retries, backoff_factor=self.backoff_factor)
+        return await self._make_request("PATCH", url, json=payload)
 
     async def get_expense_item(self, project_id: int, section_selector: str, item_id: str) -> Dict[str, Any]:
         """Fetches a collection item, ensuring auth state first."""
@@ -231,9 +406,9 @@ class FilevineClient:
         
         if check_number is not None:
             # Coerce/validate to int (strip non-digits if str)
-            if isinstance(check_number, str):
+            if isinstance(check_number, str) and not check_number.isdecimal():  # Already-clean strings skip the regex
                 original = check_number
-                check_number = re.sub(r'\D', '', check_number)  # Strip non-digits
+                check_number = _NON_DIGIT_RE.sub('', check_number)  # Strip non-digits
                 if check_number != original:
                     logger.warning(f"Stripped non-numeric chars from checknumber '{original}' → '{check_number}'")
                 if not check_number:
@@ -273,23 +448,33 @@ class FilevineClient:
         
 # Example test (run with asyncio.run(test_fetch()))
 async def test_fetch():
-    client = FilevineClient()
-    logger.info("Fetching collection item...")
-    project_id = 12361871
-    selector = "expenses"
-    project_type_id = "32506"
-    section_selector = f"{selector}{project_type_id}"
-    item_id = "c1c738ba-2409-4109-a44a-2d0b8bf56dea"
-
-    response = await client.get_expense_item(project_id=project_id, section_selector=section_selector, item_id=item_id)
-    print(response)  # This will print the JSON dict
-    return response
+    async with FilevineClient() as client:
+        logger.info("Fetching collection item...")
+        project_id = 12361871
+        selector = "expenses"
+        project_type_id = "32506"
+        section_selector = f"{selector}{project_type_id}"
+        item_id = "c1c738ba-2409-4109-a44a-2d0b8bf56dea"
+
+        response = await client.get_expense_item(project_id=project_id, section_selector=section_selector, item_id=item_id)
+        print(response)  # This will print the JSON dict
+        return response
 
 async def test_auth():
-    client = FilevineClient()
-    await client.ensure_auth_state()
-    print(client.auth_state.model_dump())
-    return client.auth_state.model_dump()
+    async with FilevineClient() as client:
+        await client.ensure_auth_state()
+        print(asdict(client.auth_state))
+        return asdict(client.auth_state)
+
+def run(coro):
+    """Runs coro on uvloop when it's installed, otherwise on the default asyncio loop."""
+    if uvloop is None:
+        return asyncio.run(coro)
+    if sys.version_info >= (3, 11):
+        with asyncio.Runner(loop_factory=uvloop.new_event_loop) as runner:
+            return runner.run(coro)
+    uvloop.install()
+    return asyncio.run(coro)
 
 if __name__ == "__main__":
-    asyncio.run(test_auth())
\ No newline at end of file
+    run(test_auth())
\ No newline at end of file
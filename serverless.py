@@ -1,10 +1,13 @@
-from jose.exceptions import JOSEError
+import jwt
 import functions_framework
+import atexit
 from google.cloud import firestore
 import os
+import signal
 from flask import make_response
-import requests
-from jose import jwt as jose_jwt
+import orjson
+import threading
+import urllib3
 import time
 
 # init firestore
@@ -17,57 +20,278 @@ FILEVINE_IDENTITY_AUTHORITY = os.getenv(
     "FILEVINE_IDENTITY_AUTHORITY", "https://identity.filevine.com")
 FILEVINE_WEBHOOK_AUDIENCE = os.getenv(
     "FILEVINE_WEBHOOK_AUDIENCE", "filevine-v2-webhooks")
+# Opt-in: buffer events and commit them in Firestore batches. Only enable on an
+# always-on instance (min instances >= 1, CPU always allocated): buffered events
+# are acknowledged before they are written, so anything still buffered when the
+# instance is killed (SIGKILL, or CPU throttled before the timer fires) is lost.
+# Buffers are flushed after WEBHOOK_BATCH_MAX_AGE_SECONDS and on SIGTERM.
+WEBHOOK_BATCH_WRITES = os.getenv(
+    "WEBHOOK_BATCH_WRITES", "false").lower() == "true"
+WEBHOOK_BATCH_MAX_SIZE = int(os.getenv("WEBHOOK_BATCH_MAX_SIZE", "100"))
+WEBHOOK_BATCH_MAX_AGE_SECONDS = float(
+    os.getenv("WEBHOOK_BATCH_MAX_AGE_SECONDS", "2.0"))
 
 
-# Cache for JWKS
+# Cache for JWKS: {"by_kid": {kid: parsed public key}, "raw": jwks}
 _jwks_cache = None
 _jwks_fetch_time = 0
-JWKS_CACHE_DURATION_SECONDS = 3600  # Cache JWKS for 1 hour
+_jwks_refresh_lock = threading.Lock()
+JWKS_CACHE_DURATION_SECONDS = 3600  # Cache JWKS for 1 hour (served stale for up to 2x while refreshing)
 
+class JWKSError(Exception):
+    """The signing keys couldn't be loaded; a server-side failure (500), not an invalid token (401)."""
 
-def get_jwks():
-    """Fetches and caches the JWKS from Filevine's identity server."""
+
+# Process-global pool so the TLS session to the identity server is reused across invocations on a warm instance
+_http = urllib3.PoolManager(timeout=urllib3.Timeout(total=5), retries=False)
+
+
+def _http_get_json(url):
+    res = _http.request("GET", url)
+    if res.status != 200:
+        raise urllib3.exceptions.HTTPError(f"GET {url} returned {res.status}")
+    return orjson.loads(res.data)
+
+
+def _fetch_jwks():
+    """Fetches the JWKS from Filevine's identity server and replaces the cache."""
     global _jwks_cache, _jwks_fetch_time
 
-    is_cache_valid = _jwks_cache and (
-        time.monotonic() - _jwks_fetch_time) < JWKS_CACHE_DURATION_SECONDS
-    if is_cache_valid:
-        print("Using cached JWKS.")
-        return _jwks_cache
+    discovery_url = f"{FILEVINE_IDENTITY_AUTHORITY}/.well-known/openid-configuration"
+    jwks_uri = _http_get_json(discovery_url)["jwks_uri"]
+    jwks = _http_get_json(jwks_uri)
 
-    try:
-        discovery_url = f"{FILEVINE_IDENTITY_AUTHORITY}/.well-known/openid-configuration"
-        discovery_res = requests.get(discovery_url, timeout=5)
-        discovery_res.raise_for_status()
-        jwks_uri = discovery_res.json()["jwks_uri"]
+    # Parse each JWK into a cryptography key once, not on every webhook
+    by_kid = {}
+    for key in jwks["keys"]:
+        if key.get("use") not in (None, "sig") or "kid" not in key:
+            continue
+        try:
+            by_kid[key["kid"]] = jwt.PyJWK(key).key
+        except jwt.exceptions.MissingCryptographyError:
+            raise
+        except jwt.PyJWTError as e:
+            # Like PyJWKSet, skip keys we can't use rather than failing the whole refresh
+            print(f"Skipping unusable JWK '{key['kid']}': {e}")
+    if not by_kid:
+        raise JWKSError("JWKS contains no usable signing keys.")
+    _jwks_cache = {"by_kid": by_kid, "raw": jwks}
+    _jwks_fetch_time = time.monotonic()
+    return _jwks_cache
 
-        jwks_res = requests.get(jwks_uri, timeout=5)
-        jwks_res.raise_for_status()
 
-        _jwks_cache = jwks_res.json()
-        _jwks_fetch_time = time.monotonic()
+def _refresh_jwks_in_background():
+    """Refreshes the JWKS on a daemon thread unless a refresh is already running."""
+    if not _jwks_refresh_lock.acquire(blocking=False):
+        return
 
-        print("Fetched and cached new JWKS.")
+    def _refresh():
+        try:
+            _fetch_jwks()
+            print("Refreshed cached JWKS in background.")
+        except (urllib3.exceptions.HTTPError, jwt.PyJWTError, JWKSError, ValueError, KeyError) as e:
+            print(f"Background JWKS refresh failed; still serving stale keys: {e}")
+        finally:
+            _jwks_refresh_lock.release()
+
+    threading.Thread(target=_refresh, daemon=True).start()
+
+
+def get_jwks():
+    """Returns the cached JWKS, refreshing it from Filevine's identity server when stale."""
+    global _jwks_cache
+
+    cache_age = time.monotonic() - _jwks_fetch_time
+    if _jwks_cache and cache_age < JWKS_CACHE_DURATION_SECONDS:
+        print("Using cached JWKS.")
+        return _jwks_cache
+
+    if _jwks_cache and cache_age < 2 * JWKS_CACHE_DURATION_SECONDS:
+        print("Using stale cached JWKS while refreshing.")
+        _refresh_jwks_in_background()
         return _jwks_cache
-    except (requests.exceptions.RequestException, KeyError) as e:
+
+    try:
+        jwks = _fetch_jwks()
+        print("Fetched and cached new JWKS.")
+        return jwks
+    except (urllib3.exceptions.HTTPError, jwt.PyJWTError, JWKSError, ValueError, KeyError) as e:
         print(f"Error fetching JWKS: {e}")
         _jwks_cache = None
-        raise
+        # Our side's problem, not the caller's: keep it out of the jwt.PyJWTError -> 401 path
+        if isinstance(e, JWKSError):
+            raise
+        raise JWKSError(f"Could not load JWKS: {e}") from e
 
 
 def find_signing_key(token, jwks):
     """Finds the correct public key from the JWKS to verify the token."""
-    unverified_header = jose_jwt.get_unverified_header(token)
+    unverified_header = jwt.get_unverified_header(token)
     kid = unverified_header.get("kid")
     if not kid:
-        raise JOSEError("JWT header is missing 'kid' (Key ID).")
+        raise jwt.InvalidTokenError("JWT header is missing 'kid' (Key ID).")
+
+    try:
+        return jwks["by_kid"][kid]
+    except KeyError:
+        raise jwt.InvalidTokenError(
+            f"Public key with matching 'kid' ({kid}) not found in JWKS.")
+
+
+# Pending Firestore writes: [(doc_ref, doc_data)]
+_pending = []
+_last_flush = time.monotonic()
+_flush_timer = None
+# Re-entrant so the SIGTERM handler (which runs on the main thread) can't deadlock against it
+_pending_lock = threading.RLock()
+_flush_lock = threading.Lock()
+FIRESTORE_MAX_BATCH_SIZE = 500  # Firestore's per-commit write limit
+SHUTDOWN_FLUSH_TIMEOUT_SECONDS = 10.0  # Stay well inside the platform's SIGTERM grace period
 
-    for key in jwks["keys"]:
-        if key["kid"] == kid:
-            return key
 
-    raise JOSEError(
-        f"Public key with matching 'kid' ({kid}) not found in JWKS.")
+def _commit(entries):
+    """Writes (doc_ref, doc_data) pairs to Firestore in as few batch commits as possible."""
+    for start in range(0, len(entries), FIRESTORE_MAX_BATCH_SIZE):
+        batch = db.batch()
+        for doc_ref, doc_data in entries[start:start + FIRESTORE_MAX_BATCH_SIZE]:
+            batch.set(doc_ref, doc_data)
+        batch.commit()
+
+
+def _schedule_flush():
+    """Starts the max-age timer for the buffer if one isn't running. Call with _pending_lock held."""
+    global _flush_timer
+
+    if _flush_timer is None:
+        _flush_timer = threading.Timer(WEBHOOK_BATCH_MAX_AGE_SECONDS, _flush_on_timer)
+        _flush_timer.daemon = True
+        _flush_timer.start()
+
+
+def _flush_pending():
+    """Commits all buffered webhook events; on failure they are kept for the next flush."""
+    global _pending, _last_flush, _flush_timer
+
+    with _pending_lock:
+        to_write, _pending = _pending, []
+        _last_flush = time.monotonic()
+        if _flush_timer is not None:
+            _flush_timer.cancel()
+            _flush_timer = None
+
+    try:
+        _commit(to_write)
+    except Exception:
+        # These events were already acknowledged, so don't drop them
+        with _pending_lock:
+            _pending = to_write + _pending
+            _schedule_flush()
+        raise
+    return [doc_ref.id for doc_ref, _ in to_write]
+
+
+def _flush_and_log():
+    try:
+        written_ids = _flush_pending()
+        if written_ids:
+            print(f"Stored {len(written_ids)} buffered webhook payload(s) in Firestore.")
+    except Exception as e:
+        print(f"Background Firestore flush failed; events kept for retry: {e}")
+
+
+def _flush_on_timer():
+    """Runs on the timer thread once the oldest buffered event reaches the max age."""
+    with _flush_lock:
+        _flush_and_log()
+
+
+def _flush_pending_in_background():
+    """Flushes the buffer on a worker thread so the triggering webhook doesn't wait on the commit."""
+    if not _flush_lock.acquire(blocking=False):
+        return
+
+    def _flush():
+        try:
+            _flush_and_log()
+        finally:
+            _flush_lock.release()
+
+    # Not a daemon: its events are already out of _pending, so interpreter exit must join it
+    # rather than kill it mid-commit (shutdown also waits on _flush_lock, see _flush_for_shutdown)
+    threading.Thread(target=_flush).start()
+
+
+def _enqueue_event(doc_data):
+    """Stores an event, or buffers it for a background batch commit when batching is enabled.
+
+    Returns the IDs of the documents written by this call (empty if the event is only queued).
+    """
+    doc_ref = db.collection("filevine_webhook_events").document()
+    if not WEBHOOK_BATCH_WRITES:
+        # Write before acknowledging so Filevine retries the webhook if this fails
+        _commit([(doc_ref, doc_data)])
+        return [doc_ref.id]
+
+    with _pending_lock:
+        _pending.append((doc_ref, doc_data))
+        # Flush on age even if no further webhook arrives after this one
+        _schedule_flush()
+        should_flush = (
+            len(_pending) >= WEBHOOK_BATCH_MAX_SIZE
+            or time.monotonic() - _last_flush > WEBHOOK_BATCH_MAX_AGE_SECONDS
+        )
+    if should_flush:
+        _flush_pending_in_background()
+    return []
+
+
+def _flush_for_shutdown():
+    """Waits (bounded) for any in-flight timer/background flush, then commits what's left.
+
+    An in-flight flush has already taken its events out of _pending, so flushing without
+    waiting would see an empty buffer and let the process exit mid-commit.
+    """
+    acquired = _flush_lock.acquire(timeout=SHUTDOWN_FLUSH_TIMEOUT_SECONDS)
+    if not acquired:
+        print("Timed out waiting for an in-flight Firestore flush; flushing remaining events anyway.")
+    try:
+        _flush_and_log()
+    finally:
+        if acquired:
+            _flush_lock.release()
+
+
+def _install_shutdown_flush():
+    """Flushes buffered events on SIGTERM (how serverless instances are recycled) and at normal exit.
+
+    The previous SIGTERM handler (e.g. gunicorn's graceful shutdown) is chained after the flush.
+    Nothing can run on SIGKILL, so events buffered at that moment are still lost.
+    """
+    atexit.register(_flush_for_shutdown)
+
+    try:
+        previous = signal.getsignal(signal.SIGTERM)
+    except ValueError:
+        return
+
+    def _handle_sigterm(signum, frame):
+        _flush_for_shutdown()
+        if callable(previous):
+            previous(signum, frame)
+        elif previous != signal.SIG_IGN:
+            # SIG_DFL (or unknown): restore default handling and re-deliver
+            signal.signal(signal.SIGTERM, signal.SIG_DFL)
+            os.kill(os.getpid(), signal.SIGTERM)
+
+    try:
+        signal.signal(signal.SIGTERM, _handle_sigterm)
+    except ValueError:
+        # Only the main thread may install signal handlers; fall back to atexit alone
+        print("Could not install SIGTERM flush handler; buffered events rely on atexit only.")
+
+
+if WEBHOOK_BATCH_WRITES:
+    _install_shutdown_flush()
 
 
 @functions_framework.http
@@ -85,11 +309,35 @@ def filevine_webhook_handler(request):
 
     token = auth_header.split(" ")[1]
 
+    # Filter before verifying: most events don't match, and the RS512 verify is the
+    # expensive part of this handler. Trust boundary: Filevine signs the bearer JWT,
+    # not the request body, so verification never vouched for the payload anyway.
+    # Skipping it here only lets an unauthenticated caller get a 200 for an event we
+    # discard without side effects; anything that is stored is still verified below.
+    try:
+        webhook_payload = orjson.loads(request.get_data(cache=True))
+    except orjson.JSONDecodeError:
+        webhook_payload = None
+    if not isinstance(webhook_payload, dict):
+        print("Error: Invalid JSON in request body.")
+        return make_response("Bad Request: Invalid JSON.", 400)
+
+    # Check for specific criteria before storing
+    object_id = webhook_payload.get('ObjectId') or {}
+    other = webhook_payload.get('Other') or {}
+    if not isinstance(object_id, dict) or not isinstance(other, dict):
+        print("Error: ObjectId/Other in webhook payload are not objects.")
+        return make_response("Bad Request: Malformed ObjectId or Other.", 400)
+
+    if object_id.get('SectionSelector') != "expenses" or object_id.get('FieldSelector') != "sendtofvcheckreq":
+        print("Payload does not match criteria; skipping storage.")
+        return make_response("Webhook received but not stored (does not match criteria).", 200)
+
     try:
         jwks = get_jwks()
         signing_key = find_signing_key(token, jwks)
 
-        jose_jwt.decode(
+        jwt.decode(
             token,
             key=signing_key,
             algorithms=["RS512"],
@@ -98,31 +346,20 @@ def filevine_webhook_handler(request):
         )
         print("JWT validated successfully.")
 
-        webhook_payload = request.get_json()
-        if not isinstance(webhook_payload, dict):
-            print("Error: Invalid JSON in request body.")
-            return make_response("Bad Request: Invalid JSON.", 400)
-
         print(
             f"Successfully parsed webhook payload for Event: {webhook_payload.get('Event')}")
 
-        # Check for specific criteria before storing
-        object_id = webhook_payload.get('ObjectId', {})
-        if object_id.get('SectionSelector') != "expenses" or object_id.get('FieldSelector') != "sendtofvcheckreq":
-            print("Payload does not match criteria; skipping storage.")
-            return make_response("Webhook received but not stored (does not match criteria).", 200)
-
         # Extract key fields and add raw_payload
         doc_data = {
             'event_type': webhook_payload.get('Event'),
             'object_type': webhook_payload.get('Object'),
             'user_id': webhook_payload.get('UserId'),
             'project_id': webhook_payload.get('ProjectId'),
-            'field_selector': webhook_payload.get('ObjectId', {}).get('FieldSelector'), # sendtofvcheckreq
-            'project_type_id': webhook_payload.get('ObjectId', {}).get('ProjectTypeId'), # 32506 for sendToQB
-            'section_selector': webhook_payload.get('ObjectId', {}).get('SectionSelector'), # expenses
-            'item_id': webhook_payload.get('Other', {}).get('ItemId'),
-            'field_id': webhook_payload.get('Other', {}).get('FieldId'), #55550550
+            'field_selector': object_id.get('FieldSelector'), # sendtofvcheckreq
+            'project_type_id': object_id.get('ProjectTypeId'), # 32506 for sendToQB
+            'section_selector': object_id.get('SectionSelector'), # expenses
+            'item_id': other.get('ItemId'),
+            'field_id': other.get('FieldId'), #55550550
             'timestamp': webhook_payload.get('Timestamp'),
             'received_at': firestore.SERVER_TIMESTAMP,
             'processed': False,
@@ -130,14 +367,19 @@ def filevine_webhook_handler(request):
             'raw_payload': webhook_payload
         }
 
-        doc_ref = db.collection("filevine_webhook_events").document()
-        doc_ref.set(doc_data)
+        written_ids = _enqueue_event(doc_data)
+        if not written_ids:
+            print("Queued webhook payload for the next Firestore batch.")
+            return make_response("Webhook received and queued for storage.", 200)
 
-        print(f"Stored webhook payload in Firestore with document ID: {doc_ref.id}")
+        print(f"Stored webhook payload in Firestore with document ID: {written_ids[0]}")
 
         return make_response("Webhook received and stored.", 200)
 
-    except JOSEError as e:
+    except JWKSError as e:
+        print(f"JWKS Error: {e}")
+        return make_response("Internal Server Error", 500)
+    except jwt.PyJWTError as e:
         print(f"JWT Validation Error: {e}")
         return make_response(f"Unauthorized: {e}", 401)
     except Exception as e: